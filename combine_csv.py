@@ -11,28 +11,137 @@ Usage:
 
 Or with short option:
     python combine_csv.py *.csv -o combined.csv
+
+Files are parsed in parallel; limit the worker processes with -j:
+    python combine_csv.py *.csv -o combined.csv -j 4
 """
 
 import argparse
 import csv
+import hashlib
+import io
+import mmap
+import os
+import re
+import struct
 import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Optional, Tuple
+
+# Records are gathered into slabs of about this many bytes and each slab is
+# written with a single write() call
+WRITE_SLAB_SIZE = 1 << 20
+
+# Spool file framing: fingerprint, then record length, then the record
+_FINGERPRINT_SIZE = 16
+_RECORD_LEN = struct.Struct('<I')
+
+# Record terminator used by csv.writer's default dialect
+LINE_TERMINATOR = b"\r\n"
 
+# Anything that can make a physical line differ from a CSV record: quoted
+# fields (which may embed commas and newlines) and bare carriage returns
+_NEEDS_CSV_RE = re.compile(rb'"|\r(?!\n)')
 
-def combine_csv_files(input_files: List[Path], output_file: Path) -> None:
+
+def record_fingerprint(record: bytes) -> bytes:
     """
-    Combine multiple CSV files, remove duplicates, keep one header.
+    Return a 128-bit digest identifying a row for duplicate detection.
+
+    The digest is taken over the row as csv.writer formats it, which is
+    unambiguous: a blank line and a row holding one empty field, or a
+    field containing a delimiter, all encode differently.
     """
-    if not input_files:
-        print("Error: No input files provided.", file=sys.stderr)
-        sys.exit(1)
+    return hashlib.blake2b(record, digest_size=_FINGERPRINT_SIZE).digest()
+
+
+def iter_raw_records(mm: mmap.mmap) -> Iterator[Tuple[bytes, bytes]]:
+    """
+    Yield (fingerprint, record) for each line of a file without quotes.
+
+    Every line is then exactly one record, already formatted the way
+    csv.writer would write it, so it is hashed and copied without decoding.
+    """
+    pos = 0
+    size = len(mm)
+    while pos < size:
+        end = mm.find(b"\n", pos)
+        if end == -1:
+            end = size
+        line = mm[pos:end]
+        pos = end + 1
+        if line.endswith(b"\r"):
+            line = line[:-1]
+        record = line + LINE_TERMINATOR
+        yield record_fingerprint(record), record
+
+
+def iter_csv_records(file_path: Path) -> Iterator[Tuple[bytes, bytes]]:
+    """
+    Yield (fingerprint, record) for each row parsed from a CSV file.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    with file_path.open('r', newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            buf.seek(0)
+            buf.truncate()
+            writer.writerow(row)
+            record = buf.getvalue().encode('utf-8', 'surrogatepass')
+            yield record_fingerprint(record), record
+
+
+def iter_file_records(file_path: Path) -> Iterator[Tuple[bytes, bytes]]:
+    """
+    Yield (fingerprint, record) for every row of one CSV file, picking the
+    raw or csv.reader path depending on its contents.
+    """
+    with file_path.open('rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if _NEEDS_CSV_RE.search(mm) is None:
+            yield from iter_raw_records(mm)
+        else:
+            yield from iter_csv_records(file_path)
 
-    # We'll store all rows here (as tuples to make them hashable)
+
+def spool_records(file_path: Path, spool_path: Path) -> None:
+    """
+    Write the (fingerprint, record) pairs of one CSV file to a spool file,
+    with duplicates inside the file already removed. Runs in a worker
+    process; records go to disk as they are read so memory stays bounded.
+    """
     seen = set()
-    all_rows = []
-    header = None
+    with spool_path.open('wb', buffering=WRITE_SLAB_SIZE) as out:
+        for key, record in iter_file_records(file_path):
+            if key not in seen:
+                seen.add(key)
+                out.write(key)
+                out.write(_RECORD_LEN.pack(len(record)))
+                out.write(record)
+
 
+def iter_spooled_records(spool_path: Path) -> Iterator[Tuple[bytes, bytes]]:
+    """
+    Read back the pairs written by spool_records(), then delete the file.
+    """
+    with spool_path.open('rb', buffering=WRITE_SLAB_SIZE) as f:
+        while True:
+            head = f.read(_FINGERPRINT_SIZE + _RECORD_LEN.size)
+            if not head:
+                break
+            (length,) = _RECORD_LEN.unpack_from(head, _FINGERPRINT_SIZE)
+            yield head[:_FINGERPRINT_SIZE], f.read(length)
+    spool_path.unlink()
+
+
+def iter_unique_records(input_files: List[Path], jobs: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Yield the unique records of all input files as encoded CSV lines, in
+    first-seen order.
+    """
+    readable = []
     for file_path in input_files:
         if not file_path.is_file():
             print(f"Warning: File not found or not a file → {file_path}", file=sys.stderr)
@@ -40,51 +149,93 @@ def combine_csv_files(input_files: List[Path], output_file: Path) -> None:
 
         print(f"Reading: {file_path}")
 
-        with file_path.open('r', newline='', encoding='utf-8') as f:
-            reader = csv.reader(f)
-
-            try:
-                first_row = next(reader)
-            except StopIteration:
-                print(f"Warning: Empty file → {file_path}", file=sys.stderr)
-                continue
-
-            # If this is the first file with content, use its header
-            if header is None:
-                header = first_row
-                # Add header as tuple for duplicate checking
-                header_tuple = tuple(header)
-                seen.add(header_tuple)
-                all_rows.append(header)
-
-            # If subsequent files have a header, skip it
-            # (we assume the header is the same or at least compatible)
-            is_header_row = (first_row == header)
-
-            if not is_header_row:
-                row_tuple = tuple(first_row)
-                if row_tuple not in seen:
-                    seen.add(row_tuple)
-                    all_rows.append(first_row)
-
-            # Process remaining rows
-            for row in reader:
-                row_tuple = tuple(row)
-                if row_tuple not in seen:
-                    seen.add(row_tuple)
-                    all_rows.append(row)
-
-    if not all_rows:
+        if file_path.stat().st_size == 0:
+            print(f"Warning: Empty file → {file_path}", file=sys.stderr)
+            continue
+
+        readable.append(file_path)
+
+    # Only a fixed-size fingerprint per unique row is kept in memory; rows
+    # are handed to the caller as soon as they are read.
+    seen = set()
+
+    def merge(records: Iterator[Tuple[bytes, bytes]]) -> Iterator[bytes]:
+        # The first file with content supplies the header. Headers of
+        # subsequent files are exact duplicates of it and are dropped by
+        # the dedup itself (we assume they are the same or compatible).
+        for key, record in records:
+            if key not in seen:
+                seen.add(key)
+                yield record
+
+    # No point starting more worker processes than there are files
+    workers = min(jobs or os.cpu_count() or 1, len(readable))
+    if workers <= 1:
+        for file_path in readable:
+            yield from merge(iter_file_records(file_path))
+        return
+
+    # Parse files in parallel. Each worker spools its file's records to disk
+    # and the merge streams them back in input order, so the header and
+    # first-seen row order are unchanged and no file is held in memory. At
+    # most `workers` files are parsed ahead of the merge.
+    with tempfile.TemporaryDirectory(prefix="combine_csv-") as spool_dir, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for i, file_path in enumerate(readable):
+            spool_path = Path(spool_dir) / f"{i}.spool"
+            pending.append((pool.submit(spool_records, file_path, spool_path), spool_path))
+            if len(pending) > workers:
+                future, done_path = pending.popleft()
+                future.result()
+                yield from merge(iter_spooled_records(done_path))
+        while pending:
+            future, done_path = pending.popleft()
+            future.result()
+            yield from merge(iter_spooled_records(done_path))
+
+
+def combine_csv_files(input_files: List[Path], output_file: Path, jobs: Optional[int] = None) -> None:
+    """
+    Combine multiple CSV files, remove duplicates, keep one header.
+    """
+    if not input_files:
+        print("Error: No input files provided.", file=sys.stderr)
+        sys.exit(1)
+
+    records = iter_unique_records(input_files, jobs)
+
+    # Don't create the output until we know there is something to write
+    header = next(records, None)
+    if header is None:
         print("No data found in any input file.", file=sys.stderr)
         sys.exit(1)
 
-    # Write combined result
+    # Stream the combined result
     print(f"Writing combined result to: {output_file}")
-    print(f"Total unique rows (including header): {len(all_rows)}")
 
-    with output_file.open('w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerows(all_rows)
+    with output_file.open('wb') as f:
+        slab = [header]
+        slab_size = len(header)
+        total = 1
+        for record in records:
+            slab.append(record)
+            slab_size += len(record)
+            total += 1
+            if slab_size >= WRITE_SLAB_SIZE:
+                f.write(b''.join(slab))
+                slab.clear()
+                slab_size = 0
+        f.write(b''.join(slab))
+
+    print(f"Total unique rows (including header): {total}")
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
 
 
 def main():
@@ -103,6 +254,12 @@ def main():
         default=Path("combined.csv"),
         help="Output file path (default: combined.csv)"
     )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=positive_int,
+        default=None,
+        help="Number of files to parse in parallel (default: number of CPUs)"
+    )
 
     args = parser.parse_args()
 
@@ -110,7 +267,7 @@ def main():
         parser.print_help()
         sys.exit(1)
 
-    combine_csv_files(args.files, args.output)
+    combine_csv_files(args.files, args.output, args.jobs)
 
 
 if __name__ == "__main__":
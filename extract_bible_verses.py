@@ -5,18 +5,23 @@ import csv
 import time
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import quote
 from typing import List, Optional
 
-import requests
-from bs4 import BeautifulSoup
+import lxml.html
+import urllib3
+from lxml import etree
+
+from page_cache import DEFAULT_CACHE_PATH, PageCache
+from verse_counts import VERSE_COUNTS
 
 BOOKS = [
     "Genesis", "Exodus", "Leviticus", "Numbers", "Deuteronomy", "Joshua", "Judges", "Ruth",
     "1 Samuel", "2 Samuel", "1 Kings", "2 Kings", "1 Chronicles", "2 Chronicles", "Ezra",
     "Nehemiah", "Esther", "Job", "Psalms", "Proverbs", "Ecclesiastes", "Song of Solomon",
     "Isaiah", "Jeremiah", "Lamentations", "Ezekiel", "Daniel", "Hosea", "Joel", "Amos",
-    "Obadiah", "Jonah", "Micah", "Nahum", "Habakkuk", "Haggai", "Zechariah", "Malachi",
+    "Obadiah", "Jonah", "Micah", "Nahum", "Habakkuk", "Zephaniah", "Haggai", "Zechariah", "Malachi",
     "Matthew", "Mark", "Luke", "John", "Acts", "Romans", "1 Corinthians", "2 Corinthians",
     "Galatians", "Ephesians", "Philippians", "Colossians", "1 Thessalonians", "2 Thessalonians",
     "1 Timothy", "2 Timothy", "Titus", "Philemon", "Hebrews", "James", "1 Peter", "2 Peter",
@@ -38,18 +43,63 @@ VERSION_CODES = {
 
 }
 
+# Compiled once at import; get_verse_text runs for every verse and translation
+_REF_RE = re.compile(r"^(?P<book>\d*\s?[A-Za-z\s]+?)\s+(?P<chapter>\d+):(?P<verse>\d+)$")
+# First div, in document order, carrying any of the passage container classes.
+# BibleGateway renders every version in VERSION_CODES with the same markup, so
+# one selector serves them all and there is no per-version selector table.
+_PASSAGE_XPATH = etree.XPath(
+    "(//div[contains(@class, 'passage-content') or contains(@class, 'passage-text')"
+    " or contains(@class, 'result-text') or contains(@class, 'text-style')])[1]"
+)
+_JUNK_XPATH = etree.XPath(
+    ".//*[self::sup or self::a or self::span][contains(@class, 'crossreference')"
+    " or contains(@class, 'footnote') or contains(@class, 'versenum') or contains(@class, 'chapternum')]"
+)
+# Collapses whitespace runs and cuts the trailing "Read full chapter ... in all
+# English translations" boilerplate in one pass (both are replaced by " ")
+_CLEAN_RE = re.compile(
+    r"\s{2,}|(?:Read\s+full\s+chapter|in\s+all\s+English\s+translations).*$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# Concurrent requests allowed against BibleGateway at any one time
+MAX_WORKERS = 4
+# Give up after this many references in a row have no text in any translation
+MAX_MISSING_VERSES = 10
+# Buffer for the exported CSV; the 8 KiB io default flushes every few rows
+WRITE_BUFFER_SIZE = 1 << 20
+
 def parse_reference(ref: str):
-    match = re.match(r"^(\d*\s?[A-Za-z\s]+)\s+(\d+):(\d+)$", ref.strip())
+    match = _REF_RE.match(ref.strip())
     if not match:
         raise ValueError(f"Invalid reference format: {ref}")
-    book = match.group(1).strip()
-    chapter = int(match.group(2))
-    verse = int(match.group(3))
+    book = match["book"]
+    chapter = int(match["chapter"])
+    verse = int(match["verse"])
     if book not in BOOKS:
         raise ValueError(f"Unknown book: {book}")
+    counts = VERSE_COUNTS[book]
+    if not 1 <= chapter <= len(counts) or not 1 <= verse <= counts[chapter - 1] + 1:
+        raise ValueError(f"No such verse: {ref}")
     return book, chapter, verse
 
-def get_verse_text(version: str, book: str, chapter: int, verse: int, session: requests.Session) -> str:
+def fetch_page(url: str, http: urllib3.PoolManager, cache: Optional[PageCache] = None) -> Optional[str]:
+    if cache is not None:
+        html = cache.get(url)
+        if html is not None:
+            return html
+
+    response = http.request("GET", url, timeout=15)
+    if response.status != 200:
+        return None
+    html = response.data.decode("utf-8", "replace")
+    if cache is not None:
+        cache.put(url, html)
+    return html
+
+def get_verse_text(version: str, book: str, chapter: int, verse: int, http: urllib3.PoolManager,
+                   cache: Optional[PageCache] = None) -> str:
     code = VERSION_CODES.get(version)
     if not code:
         return ""
@@ -59,60 +109,42 @@ def get_verse_text(version: str, book: str, chapter: int, verse: int, session: r
     url = f"https://www.biblegateway.com/passage/?search={search}&version={code}"
 
     try:
-        response = session.get(url, timeout=15)
-        if response.status_code != 200:
+        html = fetch_page(url, http, cache)
+        if html is None:
             return ""
-        soup = BeautifulSoup(response.text, "html.parser")
+        tree = lxml.html.fromstring(html)
 
         # Get the whole passage container
-        passage = soup.find("div", class_=re.compile(r"passage-content|passage-text|result-text|text-style"))
-        if not passage:
+        found = _PASSAGE_XPATH(tree)
+        if not found:
             return ""
+        passage = found[0]
 
         # Remove unwanted elements (footnotes, crossrefs, verse/chapter numbers)
-        for elem in passage.find_all(["sup", "a", "span"], class_=re.compile(r"crossreference|footnote|versenum|chapternum")):
-            elem.decompose()
+        for elem in _JUNK_XPATH(passage):
+            elem.drop_tree()
 
         # Get all remaining text
-        full_text = passage.get_text(separator=" ", strip=True)
-        full_text = re.sub(r"\s{2,}", " ", full_text).strip()
-
-        # Remove trailing "Read full chapter ... in all English translations" and similar phrases
-        full_text = re.sub(r"Read full chapter.*?(?:in all English translations)?\s*$", "", full_text, flags=re.IGNORECASE).strip()
-        full_text = re.sub(r"in all English translations.*$", "", full_text, flags=re.IGNORECASE).strip()
+        full_text = " ".join(s for s in (t.strip() for t in passage.itertext()) if s)
+        full_text = _CLEAN_RE.sub(" ", full_text).strip()
 
         return full_text
     except Exception:
         return ""
 
-def advance_reference(book: str, chapter: int, verse: int, session: requests.Session) -> Optional[tuple[str, int, int]]:
-    test_verse = verse + 1
-    test_chapter = chapter
-    test_book = book
-
-    attempts = 0
-    max_attempts = 300
-
-    while attempts < max_attempts:
-        attempts += 1
-        text = get_verse_text("NIV", test_book, test_chapter, test_verse, session)
-        if text:
-            return test_book, test_chapter, test_verse
-
-        test_verse += 1
-        if test_verse > 176:
-            test_verse = 1
-            test_chapter += 1
-            if test_chapter > 150:
-                try:
-                    idx = BOOKS.index(test_book) + 1
-                    if idx < len(BOOKS):
-                        test_book = BOOKS[idx]
-                        test_chapter = 1
-                    else:
-                        return None
-                except ValueError:
-                    return None
+def advance_reference(book: str, chapter: int, verse: int) -> Optional[tuple[str, int, int]]:
+    counts = VERSE_COUNTS[book]
+    # VERSE_COUNTS follows KJV numbering, and some modern translations number
+    # one verse past it at a chapter end (3 John 1:15, Revelation 12:18). Offer
+    # that reference once before moving on; main() skips it if nothing has it.
+    if verse <= counts[chapter - 1]:
+        return book, chapter, verse + 1
+    if chapter < len(counts):
+        return book, chapter + 1, 1
+
+    idx = BOOKS.index(book) + 1
+    if idx < len(BOOKS):
+        return BOOKS[idx], 1, 1
     return None
 
 def main():
@@ -121,6 +153,8 @@ def main():
     parser.add_argument("--count", type=int, required=True)
     parser.add_argument("--translations", default="AKJV,NIV,NRSVCE")
     parser.add_argument("--out", default="output.csv")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="SQLite file used to cache fetched pages")
+    parser.add_argument("--no-cache", action="store_true", help="Always fetch pages from the network")
     args = parser.parse_args()
 
     translations = [t.strip() for t in args.translations.split(",")]
@@ -129,39 +163,72 @@ def main():
 
     rows = []
     exported = 0
-    session = requests.Session()
-    session.headers.update({"User-Agent": "BibleExporter/1.0"})
-
-    print("Starting export...")
-    while exported < args.count:
-        ref = f"{current_book} {current_chapter}:{current_verse}"
-        row = {"ref": ref}
+    missing = 0
+    http = urllib3.PoolManager(
+        num_pools=1,
+        maxsize=MAX_WORKERS,
+        headers=urllib3.util.make_headers(user_agent="BibleExporter/1.0", accept_encoding=True),
+    )
+    cache = None if args.no_cache else PageCache(args.cache)
 
-        has_text = False
-        for trans in translations:
-            print(f"Fetching {ref} ({trans})...   ", end="\r")
-            text = get_verse_text(trans, current_book, current_chapter, current_verse, session)
-            row[trans] = text
-            if text:
-                has_text = True
+    def submit_verse(pool, book, chapter, verse):
+        return [pool.submit(get_verse_text, trans, book, chapter, verse, http, cache) for trans in translations]
 
-        if not has_text:
-            print(f"\nNo text for {ref} in any translation. Stopping early.")
-            break
-
-        rows.append(row)
-        exported += 1
-
-        next_ref = advance_reference(current_book, current_chapter, current_verse, session)
-        if next_ref is None:
-            print("\nReached end of Bible.")
-            break
-        current_book, current_chapter, current_verse = next_ref
-
-        time.sleep(1.3)
+    print("Starting export...")
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            misses_seen = cache.misses if cache else 0
+            futures = submit_verse(pool, current_book, current_chapter, current_verse)
+
+            while exported < args.count:
+                ref = f"{current_book} {current_chapter}:{current_verse}"
+                row = {"ref": ref}
+
+                # All translations of this verse were fetched in parallel
+                print(f"Fetching {ref}...   ", end="\r")
+                for trans, future in zip(translations, futures):
+                    row[trans] = future.result()
+                has_text = any(row[t] for t in translations)
+
+                # Did fetching this verse hit the server rather than the cache?
+                misses_now = cache.misses if cache else 0
+                fetched = cache is None or misses_now != misses_seen
+                misses_seen = misses_now
+
+                if has_text:
+                    rows.append(row)
+                    exported += 1
+                    missing = 0
+                else:
+                    # Modern translations omit some verses (e.g. Matthew 17:21), and the
+                    # extra reference tried at each chapter end usually doesn't exist
+                    missing += 1
+                    if missing >= MAX_MISSING_VERSES:
+                        print(f"\nNo text for the last {missing} references. Stopping early.")
+                        break
+                    if current_verse <= VERSE_COUNTS[current_book][current_chapter - 1]:
+                        print(f"\nNo text for {ref} in any translation, skipping.")
+
+                next_ref = advance_reference(current_book, current_chapter, current_verse)
+                if next_ref is None:
+                    print("\nReached end of Bible.")
+                    break
+                current_book, current_chapter, current_verse = next_ref
+
+                # The next reference comes from the verse table, so its fetches can
+                # start now and overlap the politeness delay below
+                if exported < args.count:
+                    futures = submit_verse(pool, current_book, current_chapter, current_verse)
+
+                # Only be polite to the server if we actually hit it for this verse
+                if fetched:
+                    time.sleep(1.3)
+    finally:
+        if cache is not None:
+            cache.close()
 
     print("\nWriting CSV...")
-    with open(args.out, "w", newline="", encoding="utf-8") as f:
+    with open(args.out, "w", newline="", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as f:
         fieldnames = ["BOOK CHAPTER:VERSE"] + translations
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
@@ -5,47 +5,84 @@ Output JSON with requested structure + short contradiction description.
 """
 
 import argparse
-import json
 import re
 import sys
 from urllib.parse import quote
-from datetime import datetime
-from typing import Dict
-
-import requests
-from bs4 import BeautifulSoup
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import lxml.html
+import numpy as np
+import orjson
+import urllib3
+from lxml import etree
+
+from page_cache import DEFAULT_CACHE_PATH, PageCache
+
+_REF_RE = re.compile(r"^(?P<book>[A-Za-z\s]+?)\s+(?P<chapter>\d+):(?P<verse>\d+)$")
+_VERSE_NUM_RE = re.compile(r'\[\d+\]|\d+\s*')
+# One pass over the text: either the trailing "Read full chapter" / "in all
+# English translations" boilerplate, or a run of whitespace and verse/footnote
+# numbers
+_CLEAN_RE = re.compile(
+    r'(?P<trailer>(?:Read\s+full\s+chapter|in\s+all\s+English\s+translations).*)'
+    r'|(?:\s+|\[\d+\]|\d+\s*)+',
+    re.I | re.S,
+)
+_BLOCK_XPATH = etree.XPath(
+    "//*[self::p or self::div][contains(@class, 'version') or contains(@class, 'text')"
+    " or contains(@class, 'result') or contains(@class, 'passage')]"
+)
+_VERSION_TAG_XPATH = etree.XPath(
+    r"(.//*[self::strong or self::b or self::span or self::em][not(*)][re:test(., '\[.*?\]')])[1]",
+    namespaces={"re": "http://exslt.org/regular-expressions"},
+)
+
+
+def _clean_match(match: re.Match) -> str:
+    if match['trailer']:
+        return ''
+    # Drop the numbers; whitespace not swallowed by a number collapses to one space
+    return ' ' if _VERSE_NUM_RE.sub('', match.group()) else ''
 
 
 def clean_verse_text(text: str) -> str:
-    text = re.sub(r'\[\d+\]|\d+\s*', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    text = re.sub(r'(Read full chapter|in all English translations).*', '', text, flags=re.I)
-    return text.strip()
-
+    return _CLEAN_RE.sub(_clean_match, text).strip()
+
+
+def get_all_translations(url: str, http: urllib3.PoolManager, cache: Optional[PageCache] = None) -> Dict[str, str]:
+    html = cache.get(url) if cache is not None else None
+    # A blank cached page can only be left over from a bad fetch; refetch it
+    if html is None or not html.strip():
+        try:
+            r = http.request("GET", url, timeout=12)
+        except Exception as e:
+            print(f"Failed to fetch page: {e}", file=sys.stderr)
+            return {}
+        if r.status >= 400:
+            print(f"Failed to fetch page: HTTP {r.status}", file=sys.stderr)
+            return {}
+        html = r.data.decode("utf-8", "replace")
+        if not html.strip():
+            return {}
+        if cache is not None:
+            cache.put(url, html)
 
-def get_all_translations(url: str) -> Dict[str, str]:
-    headers = {"User-Agent": "BibleJsonExporter/1.0"}
     try:
-        r = requests.get(url, headers=headers, timeout=12)
-        r.raise_for_status()
-    except Exception as e:
-        print(f"Failed to fetch page: {e}", file=sys.stderr)
+        tree = lxml.html.fromstring(html)
+    except (etree.ParserError, ValueError):
         return {}
 
-    soup = BeautifulSoup(r.text, "html.parser")
-
     translations = {}
 
-    blocks = soup.find_all(["p", "div"], class_=re.compile(r"version|text|result|passage"))
-
-    for block in blocks:
-        version_tag = block.find(["strong", "b", "span", "em"], string=re.compile(r'\[.*?\]'))
+    for block in _BLOCK_XPATH(tree):
+        version_tags = _VERSION_TAG_XPATH(block)
         version = None
-        if version_tag:
-            version = version_tag.get_text(strip=True).strip("[]").upper()
-            version_tag.decompose()
+        if version_tags:
+            version = version_tags[0].text_content().strip().strip("[]").upper()
+            version_tags[0].drop_tree()
 
-        text = clean_verse_text(block.get_text(" ", strip=True))
+        text = clean_verse_text(" ".join(s for s in (t.strip() for t in block.itertext()) if s))
         if text and len(text) > 15:
             if not version:
                 text_lower = text.lower()
@@ -64,23 +101,21 @@ def calculate_contradiction_score(variants: Dict[str, str]) -> float:
     if len(variants) < 2:
         return 0.0
 
-    texts = list(variants.values())
-    total_diff = 0
-    count = 0
-
-    for i in range(len(texts)):
-        for j in range(i + 1, len(texts)):
-            words_i = set(texts[i].lower().split())
-            words_j = set(texts[j].lower().split())
-            diff = len(words_i.symmetric_difference(words_j))
-            total_diff += diff
-            count += 1
-
-    if count == 0:
-        return 0.0
-
-    avg_diff = total_diff / count
-    score = min(100.0, avg_diff * 5)  # same scaling as before
+    # One-hot token matrix: m[i, w] == 1 when word w occurs in variant i.
+    # Then |A_i ^ A_j| = |A_i| + |A_j| - 2 |A_i & A_j|, and every pairwise
+    # intersection comes out of a single matrix product.
+    token_sets = [frozenset(text.lower().split()) for text in variants.values()]
+    vocab = {w: i for i, w in enumerate(frozenset().union(*token_sets))}
+    m = np.zeros((len(token_sets), len(vocab)), dtype=np.float32)
+    for i, words in enumerate(token_sets):
+        m[i, [vocab[w] for w in words]] = 1.0
+
+    sizes = m.sum(axis=1)
+    sym_diff = sizes[:, None] + sizes[None, :] - 2 * (m @ m.T)
+    pair_diffs = sym_diff[np.triu_indices(len(token_sets), k=1)]
+
+    avg_diff = pair_diffs.mean(dtype=np.float64)
+    score = min(100.0, float(avg_diff) * 5)  # same scaling as before
     return round(score, 1)
 
 
@@ -121,17 +156,19 @@ def main():
     parser = argparse.ArgumentParser(description="Fetch one Bible verse → JSON in requested format")
     parser.add_argument("--verse", required=True, help='Reference, e.g. "Genesis 1:1"')
     parser.add_argument("--out", default="verse.json", help="Output JSON file")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="SQLite file used to cache fetched pages")
+    parser.add_argument("--no-cache", action="store_true", help="Always fetch the page from the network")
     args = parser.parse_args()
 
     ref = args.verse.strip()
-    match = re.match(r"^([A-Za-z\s]+)\s+(\d+):(\d+)$", ref)
+    match = _REF_RE.match(ref)
     if not match:
         print("Invalid format. Use e.g. 'Genesis 1:1'", file=sys.stderr)
         sys.exit(1)
 
-    book_name = match.group(1).strip()
-    chapter = int(match.group(2))
-    verse_num = int(match.group(3))
+    book_name = match["book"]
+    chapter = int(match["chapter"])
+    verse_num = int(match["verse"])
 
     book_encoded = quote(book_name)
     cv_encoded = quote(f"{chapter}:{verse_num}")
@@ -139,10 +176,14 @@ def main():
 
     print(f"Fetching: {url}")
 
-    session = requests.Session()
-    session.headers.update({"User-Agent": "BibleJsonExporter/1.0"})
+    http = urllib3.PoolManager(
+        headers=urllib3.util.make_headers(user_agent="BibleJsonExporter/1.0", accept_encoding=True),
+    )
 
-    translations = get_all_translations(url)
+    cache = None if args.no_cache else PageCache(args.cache)
+    translations = get_all_translations(url, http, cache)
+    if cache is not None:
+        cache.close()
 
     if not translations:
         print("No translations found on the page.", file=sys.stderr)
@@ -153,7 +194,7 @@ def main():
     contradiction_score = calculate_contradiction_score(translations)
     short_desc = generate_short_contradiction_desc(translations, contradiction_score)
 
-    now_iso = datetime.utcnow().isoformat(timespec='seconds') + "Z"
+    now_iso = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
     output = {
         "book": book_name,
@@ -166,8 +207,10 @@ def main():
         "contradiction_desc": short_desc
     }
 
-    with open(args.out, "w", encoding="utf-8") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
+    # orjson serializes straight to UTF-8 bytes, so the whole document goes
+    # out in a single write
+    with open(args.out, "wb") as f:
+        f.write(orjson.dumps(output, option=orjson.OPT_INDENT_2))
 
     print(f"\nDone. Wrote to {args.out}")
     print(f"Translations: {len(translations)}")
@@ -0,0 +1,57 @@
+"""
+On-disk cache of fetched BibleGateway pages, shared by the export scripts.
+
+Pages are stored in a small SQLite database keyed by URL, so a rerun over
+the same verses is answered locally instead of going back over the network.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+DEFAULT_CACHE_PATH = "biblegateway.sqlite"
+DEFAULT_MAX_AGE = 30 * 86400  # seconds
+
+
+class PageCache:
+    """
+    URL -> HTML store backed by SQLite. Safe to share between threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_age: int = DEFAULT_MAX_AGE):
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, html TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT html FROM pages WHERE url = ? AND fetched_at >= ?",
+                (url, time.time() - self.max_age),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, url: str, html: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, html, fetched_at) VALUES (?, ?, ?)",
+                (url, html, time.time()),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
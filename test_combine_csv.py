@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Checks for combine_csv.py dedup.
+
+Run with:
+    python -m unittest test_combine_csv
+"""
+
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+from combine_csv import combine_csv_files
+
+
+class CombineCsvTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def combine(self, *contents: bytes) -> bytes:
+        inputs = []
+        for i, data in enumerate(contents):
+            path = self.dir / f"in{i}.csv"
+            path.write_bytes(data)
+            inputs.append(path)
+        output = self.dir / "out.csv"
+        with redirect_stdout(StringIO()):
+            combine_csv_files(inputs, output, jobs=1)
+        return output.read_bytes()
+
+    def test_blank_line_and_empty_field_are_distinct(self):
+        # The first file has no quotes and takes the raw mmap path; the
+        # second is parsed with csv.reader. Both rows must survive.
+        self.assertEqual(self.combine(b'\n', b'""\n'), b'\r\n""\r\n')
+        self.assertEqual(self.combine(b'""\n', b'\n'), b'""\r\n\r\n')
+
+    def test_duplicates_match_across_raw_and_csv_paths(self):
+        raw = b'ref,KJV\r\nGen 1:1,text\r\n'
+        quoted = b'"ref","KJV"\r\n"Gen 1:1","text"\r\n"Gen 1:2","more, text"\r\n'
+        self.assertEqual(
+            self.combine(raw, quoted),
+            b'ref,KJV\r\nGen 1:1,text\r\nGen 1:2,"more, text"\r\n',
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()